@@ -0,0 +1,91 @@
+import hashlib
+import logging
+import os
+from pathlib import Path
+from typing import Optional
+
+from diskcache import Cache
+from dotenv import load_dotenv
+
+# This module is imported before the graph loads the .env file, so load it here too
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+# Caches live next to the backend package, independent of the directory the server is
+# launched from, so restarts always find the warm cache
+CACHE_DIR = Path(__file__).resolve().parents[2] / ".cache"
+
+# How long a cached LLM response stays valid, in seconds (default: 1 day)
+RESPONSE_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", 24 * 60 * 60))
+
+# Persistent on-disk cache shared by every worker of the server
+response_cache = Cache(os.getenv("LLM_CACHE_DIR", str(CACHE_DIR / "llm_responses")))
+
+
+# The semantic cache of web research results, it needs sentence-transformers (and torch)
+# so it can be turned off to keep the server light
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# How long a cached web research result is reused (default: same as LLM responses)
+SEARCH_CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", RESPONSE_CACHE_TTL))
+
+# Maximum disk space of each semantic cache store (embeddings, payloads) in bytes, least
+# recently stored entries are evicted first (default: 256MB)
+SEARCH_CACHE_SIZE_LIMIT = int(os.getenv("SEMANTIC_CACHE_SIZE_LIMIT", 256 * 1024 * 1024))
+
+
+def is_cacheable(temperature: float) -> bool:
+    """
+    Only deterministic (temperature 0) generations are worth caching, sampled ones are
+    expected to differ between calls.
+    """
+    return temperature == 0
+
+
+def make_cache_key(model: str, temperature: float, kind: str, prompt: str) -> str:
+    """
+    Build the exact-match cache key for a model call.
+
+    `kind` distinguishes plain text responses from structured ones (the schema name),
+    so the same prompt asked for different output shapes doesn't collide.
+    """
+    return hashlib.sha256(f"{model}|{temperature}|{kind}|{prompt}".encode()).hexdigest()
+
+
+def get_cached_response(key: str) -> Optional[str]:
+    """
+    Return the cached serialized response for the key, or None on a miss.
+
+    The cache is best-effort, a failing store (locked database, full disk, ...) is logged
+    and treated as a miss.
+    """
+    try:
+        return response_cache.get(key)
+    except Exception:
+        logger.warning("LLM response cache lookup failed", exc_info=True)
+        return None
+
+
+def set_cached_response(key: str, value: str) -> None:
+    """
+    Store a serialized response under the key for RESPONSE_CACHE_TTL seconds.
+
+    Failures are logged and otherwise ignored, like lookups.
+    """
+    try:
+        response_cache.set(key, value, expire=RESPONSE_CACHE_TTL)
+    except Exception:
+        logger.warning("LLM response cache insert failed", exc_info=True)
+
+
+search_cache = None
+if SEMANTIC_CACHE_ENABLED:
+    from agent.semantic_cache import SemanticSearchCache
+
+    search_cache = SemanticSearchCache(
+        os.getenv("SEMANTIC_CACHE_DIR", str(CACHE_DIR / "web_search")),
+        ttl=SEARCH_CACHE_TTL,
+        size_limit=SEARCH_CACHE_SIZE_LIMIT,
+    )
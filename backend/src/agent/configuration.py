@@ -1,5 +1,6 @@
+import functools
 import os
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Any, Optional
 
 from langchain_core.runnables import RunnableConfig
@@ -8,6 +9,9 @@ from langchain_core.runnables import RunnableConfig
 class Configuration(BaseModel):
     """The configuration for the agent."""
 
+    # Instances are memoized and shared between runs, so they must not be mutated
+    model_config = ConfigDict(frozen=True)
+
     query_generator_model: str = Field(
         default="gemini-2.0-flash",
         metadata={
@@ -39,6 +43,13 @@ class Configuration(BaseModel):
         metadata={"description": "The maximum number of research loops to perform."},
     )
 
+    speculative: bool = Field(
+        default=False,
+        metadata={
+            "description": "Whether to race the query generator model against OpenRouter reflection models and use the first valid response."
+        },
+    )
+
     @classmethod
     def from_runnable_config(
         cls, config: Optional[RunnableConfig] = None
@@ -57,4 +68,16 @@ class Configuration(BaseModel):
         # Filter out None values
         values = {k: v for k, v in raw_values.items() if v is not None}
 
-        return cls(**values)
+        # Every node of a run (and every parallel branch) resolves the same values, so
+        # reuse the validated instance instead of re-validating it each time
+        try:
+            return cls._from_values(tuple(sorted(values.items())))
+        except TypeError:
+            # Unhashable values can't be memoized
+            return cls(**values)
+
+    @classmethod
+    @functools.lru_cache(maxsize=128)
+    def _from_values(cls, values: tuple) -> "Configuration":
+        """Create a Configuration instance from sorted (name, value) pairs, memoized."""
+        return cls(**dict(values))
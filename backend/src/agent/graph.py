@@ -1,10 +1,19 @@
+import asyncio
+import functools
+import logging
 import os
-import requests
-import json
+import re
+import weakref
+from itertools import chain
+from typing import Optional
+
+import httpx
+import numpy as np
+import orjson
 
 from agent.tools_and_schemas import SearchQueryList, Reflection
 from dotenv import load_dotenv
-from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from langgraph.types import Send
 from langgraph.graph import StateGraph
 from langgraph.graph import START, END
@@ -18,38 +27,116 @@ from agent.state import (
     WebSearchState,
 )
 from agent.configuration import Configuration
+from agent.cache import (
+    get_cached_response,
+    is_cacheable,
+    make_cache_key,
+    search_cache,
+    set_cached_response,
+)
 from agent.prompts import (
     get_current_date,
     query_writer_instructions,
+    query_writer_input,
     web_searcher_instructions,
+    web_searcher_input,
     reflection_instructions,
+    reflection_input,
     answer_instructions,
+    answer_input,
 )
 from langchain_google_genai import ChatGoogleGenerativeAI
 from agent.utils import (
+    compile_alternation,
     get_citations,
     get_research_topic,
     insert_citation_markers,
+    remap_short_urls,
     resolve_urls,
+    truncate_summaries,
 )
 
 load_dotenv()
 
-if os.getenv("GEMINI_API_KEY") is None:
+logger = logging.getLogger(__name__)
+
+# Resolve the environment once at import instead of on every model call
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
+SITE_URL = os.getenv("YOUR_SITE_URL", "http://localhost:2024")
+SITE_NAME = os.getenv("YOUR_SITE_NAME", "LangGraph Research Agent")
+
+if GEMINI_API_KEY is None:
     raise ValueError("GEMINI_API_KEY is not set")
 
 # Check for OpenRouter API key if we're using OpenRouter models
 def check_openrouter_requirements():
     """Check if OpenRouter API key is set when needed."""
-    if os.getenv("OPENROUTER_API_KEY") is None:
+    if OPENROUTER_API_KEY is None:
         print("WARNING: OPENROUTER_API_KEY is not set. OpenRouter models (DeepSeek, GPT-4, etc.) will not work.")
         print("Please add OPENROUTER_API_KEY to your .env file to use non-Gemini models.")
 
 # Run the check on import
 check_openrouter_requirements()
 
-# Used for Google Search API
-genai_client = Client(api_key=os.getenv("GEMINI_API_KEY"))
+# Async clients keep their connection pools bound to the event loop that opened them,
+# so each running loop gets its own set of clients, dropped together with the loop
+_loop_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_loop_client(key, factory):
+    """Return the client stored under `key` for the running event loop, creating it with `factory` on first use."""
+    clients = _loop_clients.setdefault(asyncio.get_running_loop(), {})
+    if key not in clients:
+        clients[key] = factory()
+    return clients[key]
+
+
+def get_genai_client() -> Client:
+    """Return the google genai client (used for the Google Search API) of the running event loop."""
+    return get_loop_client("genai", lambda: Client(api_key=GEMINI_API_KEY))
+
+
+# Shared HTTP client for OpenRouter so keep-alive connections (and their TLS
+# sessions) are reused across calls instead of re-handshaking every request
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Create the HTTP client used for OpenRouter calls."""
+    return httpx.AsyncClient(
+        headers={
+            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+            "Content-Type": "application/json",
+            "HTTP-Referer": SITE_URL,
+            "X-Title": SITE_NAME,
+        },
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        timeout=httpx.Timeout(30.0, read=120.0),
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the OpenRouter HTTP client of the running event loop, creating it on first use."""
+    client = get_loop_client("openrouter", create_http_client)
+    if client.is_closed:
+        client = _loop_clients[asyncio.get_running_loop()]["openrouter"] = create_http_client()
+    return client
+
+
+# Fragments of the OpenRouter errors returned when no provider of a model honours
+# `response_format` (no endpoint left after require_parameters, or the parameter rejected)
+STRUCTURED_OUTPUT_UNSUPPORTED_ERRORS = ("No endpoints found", "response_format", "json_schema")
+
+# Models found to have no provider supporting structured output mode, remembered for the
+# lifetime of the process so they go straight to the schema-in-prompt request
+structured_output_unsupported_models: set[str] = set()
+
+
+class StructuredOutputUnsupportedError(Exception):
+    """Raised when OpenRouter can't serve a model in structured output mode."""
 
 
 def is_openrouter_model(model: str) -> bool:
@@ -58,13 +145,31 @@ def is_openrouter_model(model: str) -> bool:
     return any(model.startswith(prefix) for prefix in openrouter_prefixes)
 
 
-def call_openrouter_model(model: str, messages: list, temperature: float = 0.0) -> str:
-    """Call OpenRouter API with the given model and messages."""
+async def acall_openrouter_model(
+    model: str,
+    messages: list,
+    temperature: float = 0.0,
+    response_format: Optional[dict] = None,
+) -> str:
+    """Call OpenRouter API with the given model and messages.
+
+    When `response_format` is given the request is only routed to providers that
+    support it, so the model is constrained to that output format.
+    """
     try:
         # Convert LangChain message format to OpenRouter format
         openrouter_messages = []
         for msg in messages:
-            if isinstance(msg, HumanMessage):
+            if isinstance(msg, SystemMessage):
+                # Mark the static instructions as a cacheable prefix (honoured by Anthropic,
+                # the other providers cache prompt prefixes automatically)
+                openrouter_messages.append({
+                    "role": "system",
+                    "content": [
+                        {"type": "text", "text": msg.content, "cache_control": {"type": "ephemeral"}}
+                    ],
+                })
+            elif isinstance(msg, HumanMessage):
                 openrouter_messages.append({"role": "user", "content": msg.content})
             elif isinstance(msg, AIMessage):
                 openrouter_messages.append({"role": "assistant", "content": msg.content})
@@ -72,59 +177,202 @@ def call_openrouter_model(model: str, messages: list, temperature: float = 0.0)
                 # For string messages, assume they're user messages
                 openrouter_messages.append({"role": "user", "content": str(msg)})
         
-        response = requests.post(
-            url="https://openrouter.ai/api/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {os.getenv('OPENROUTER_API_KEY')}",
-                "Content-Type": "application/json",
-                "HTTP-Referer": os.getenv("YOUR_SITE_URL", "http://localhost:2024"),
-                "X-Title": os.getenv("YOUR_SITE_NAME", "LangGraph Research Agent"),
-            },
-            data=json.dumps({
-                "model": model,
-                "messages": openrouter_messages,
-                "temperature": temperature,
-            })
-        )
+        payload = {
+            "model": model,
+            "messages": openrouter_messages,
+            "temperature": temperature,
+        }
+        if response_format:
+            payload["response_format"] = response_format
+            payload["provider"] = {"require_parameters": True}
+
+        response = await get_http_client().post(OPENROUTER_URL, content=orjson.dumps(payload))
         
         if response.status_code == 200:
-            result = response.json()
+            result = orjson.loads(response.content)
             return result["choices"][0]["message"]["content"]
+        elif (
+            response_format
+            and response.status_code in (400, 404)
+            and any(error in response.text for error in STRUCTURED_OUTPUT_UNSUPPORTED_ERRORS)
+        ):
+            raise StructuredOutputUnsupportedError(
+                f"OpenRouter API error: {response.status_code} - {response.text}"
+            )
         else:
             raise Exception(f"OpenRouter API error: {response.status_code} - {response.text}")
             
+    except StructuredOutputUnsupportedError:
+        raise
     except Exception as e:
         raise Exception(f"Error calling OpenRouter API: {str(e)}")
 
 
-def call_model_with_structured_output(model: str, prompt: str, schema_class, temperature: float = 1.0):
-    """Call model (Gemini or OpenRouter) and return structured output."""
-    if is_openrouter_model(model):
-        # For OpenRouter models, we'll need to parse the JSON manually
-        enhanced_prompt = f"""
-{prompt}
+def get_gemini_llm(model: str, temperature: float) -> ChatGoogleGenerativeAI:
+    """Return a shared Gemini chat model, built once per (model, temperature) and event loop."""
+    return get_loop_client(
+        ("gemini", model, temperature),
+        lambda: ChatGoogleGenerativeAI(
+            model=model,
+            temperature=temperature,
+            max_retries=2,
+            api_key=GEMINI_API_KEY,
+        ),
+    )
 
-Please respond with a valid JSON object that matches this schema:
-{schema_class.model_json_schema()}
 
-Return ONLY the JSON object, no additional text.
-"""
-        
-        response_text = call_openrouter_model(model, [enhanced_prompt], temperature)
-        
-        # Try to extract JSON from the response
+def get_structured_gemini_llm(model: str, temperature: float, schema_class):
+    """Return a shared Gemini chat model bound to the given output schema."""
+    return get_loop_client(
+        ("gemini", model, temperature, schema_class),
+        lambda: get_gemini_llm(model, temperature).with_structured_output(schema_class),
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def get_response_format(schema_class) -> dict:
+    """Return the OpenRouter structured output `response_format` for a schema class, built once per class."""
+    # Strict mode requires objects to explicitly forbid extra keys
+    schema = {**schema_class.model_json_schema(), "additionalProperties": False}
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": schema_class.__name__, "schema": schema, "strict": True},
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def get_schema_json(schema_class) -> str:
+    """Return the compact JSON schema of a structured output class, computed once per class."""
+    return orjson.dumps(schema_class.model_json_schema()).decode()
+
+
+# Markdown code fences models like to wrap their JSON output in
+CODE_FENCE_PATTERN = re.compile(r"^```(?:json)?|```$", re.M)
+
+
+def build_messages(instructions: Optional[str], prompt: str) -> list:
+    """Build the message list for a call, with the static instructions first as a system message."""
+    if instructions:
+        return [SystemMessage(content=instructions), HumanMessage(content=prompt)]
+    return [HumanMessage(content=prompt)]
+
+
+async def acall_openrouter_structured(
+    model: str, prompt: str, schema_class, temperature: float, instructions: Optional[str]
+):
+    """Call an OpenRouter model in structured output mode and validate its response.
+
+    Not every model has a provider supporting structured output mode (OpenRouter then
+    finds no endpoint for the request); those models are remembered and asked with the
+    schema in the prompt instead. Any other error is raised.
+    """
+    if model not in structured_output_unsupported_models:
         try:
-            # Remove any markdown formatting
-            cleaned_response = response_text.strip()
-            if cleaned_response.startswith("```json"):
-                cleaned_response = cleaned_response.replace("```json", "").replace("```", "").strip()
-            elif cleaned_response.startswith("```"):
-                cleaned_response = cleaned_response.replace("```", "").strip()
-            
-            # Parse JSON
-            parsed_json = json.loads(cleaned_response)
-            return schema_class(**parsed_json)
-        except (json.JSONDecodeError, Exception) as e:
+            response_text = await acall_openrouter_model(
+                model,
+                build_messages(instructions, prompt),
+                temperature,
+                response_format=get_response_format(schema_class),
+            )
+            return schema_class.model_validate(orjson.loads(response_text))
+        except StructuredOutputUnsupportedError as e:
+            structured_output_unsupported_models.add(model)
+            logger.warning(
+                "%s doesn't support structured output mode, putting the schema in the prompt instead: %s",
+                model,
+                e,
+            )
+
+    enhanced_prompt = (
+        prompt
+        + "\n\nPlease respond with a valid JSON object that matches this schema:\n"
+        + get_schema_json(schema_class)
+        + "\n\nReturn ONLY the JSON object, no additional text.\n"
+    )
+    response_text = await acall_openrouter_model(
+        model, build_messages(instructions, enhanced_prompt), temperature
+    )
+    # Remove any markdown formatting
+    cleaned_response = CODE_FENCE_PATTERN.sub("", response_text.strip()).strip()
+    return schema_class.model_validate(orjson.loads(cleaned_response))
+
+
+async def acall_gemini_structured(
+    model: str, prompt: str, schema_class, temperature: float, instructions: Optional[str]
+):
+    """Call a Gemini model with structured output, raising if it returns nothing usable."""
+    structured_llm = get_structured_gemini_llm(model, temperature, schema_class)
+    result = await structured_llm.ainvoke(build_messages(instructions, prompt))
+    if result is None:
+        raise ValueError(f"{model} returned no structured output")
+    return result
+
+
+async def first_valid_result(coroutines: list) -> tuple[int, object]:
+    """Run the coroutines concurrently and return the first result that doesn't raise.
+
+    Returns the position of the winning coroutine in the list along with its result. The
+    remaining ones are cancelled as soon as a result is available. If every coroutine
+    fails, the last error is raised.
+    """
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    pending = set(tasks)
+    error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return tasks.index(task), task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def acall_model_with_structured_output(
+    model: str,
+    prompt: str,
+    schema_class,
+    temperature: float = 1.0,
+    instructions: Optional[str] = None,
+    speculative_model: Optional[str] = None,
+    use_fallback: bool = True,
+):
+    """Call model (Gemini or OpenRouter) and return structured output.
+
+    `instructions` is the static part of the prompt, sent as the system message so it can
+    be served from the provider's prompt cache. For OpenRouter models a Gemini
+    `speculative_model` can be raced against the main call, the first valid response wins
+    and hides OpenRouter's tail latency and malformed outputs. With `use_fallback` disabled
+    a failed OpenRouter call raises instead of returning a placeholder response.
+    """
+    cache_key = None
+    if is_cacheable(temperature):
+        cache_key = make_cache_key(
+            model, temperature, schema_class.__name__, f"{instructions or ''}\n\n{prompt}"
+        )
+        cached = await asyncio.to_thread(get_cached_response, cache_key)
+        if cached is not None:
+            return schema_class.model_validate_json(cached)
+
+    if is_openrouter_model(model):
+        # For OpenRouter models, the schema is enforced through structured output mode
+        attempts = [acall_openrouter_structured(model, prompt, schema_class, temperature, instructions)]
+        if speculative_model:
+            attempts.append(
+                acall_gemini_structured(speculative_model, prompt, schema_class, temperature, instructions)
+            )
+
+        try:
+            winner, result = await first_valid_result(attempts)
+        except Exception as e:
+            if not use_fallback:
+                raise
+            logger.error(
+                "Structured output from %s failed, using a fallback response", model, exc_info=True
+            )
             # Fallback: try to extract meaningful data
             if schema_class == Reflection:
                 # For reflection, create a basic response
@@ -135,39 +383,97 @@ Return ONLY the JSON object, no additional text.
                 )
             elif schema_class == SearchQueryList:
                 # For search queries, create a basic response
-                return SearchQueryList(query=["search query"])
+                return SearchQueryList(
+                    query=["search query"],
+                    rationale="Unable to parse structured response",
+                )
             else:
                 raise Exception(f"Failed to parse structured output: {str(e)}")
+
+        # The key is for `model`, so a response from the speculative model isn't cached
+        if winner != 0:
+            cache_key = None
     else:
         # Use original Gemini approach
-        llm = ChatGoogleGenerativeAI(
-            model=model,
-            temperature=temperature,
-            max_retries=2,
-            api_key=os.getenv("GEMINI_API_KEY"),
-        )
-        structured_llm = llm.with_structured_output(schema_class)
-        return structured_llm.invoke(prompt)
+        result = await acall_gemini_structured(model, prompt, schema_class, temperature, instructions)
 
+    # Fallback responses return early above, so only real model output is cached
+    if cache_key:
+        await asyncio.to_thread(set_cached_response, cache_key, result.model_dump_json())
+    return result
+
+
+async def acall_model_simple(
+    model: str,
+    prompt: str,
+    temperature: float = 0.0,
+    instructions: Optional[str] = None,
+) -> str:
+    """Call model (Gemini or OpenRouter) and return simple text response.
+
+    `instructions` is the static part of the prompt, sent as the system message so it can
+    be served from the provider's prompt cache.
+    """
+    cache_key = None
+    if is_cacheable(temperature):
+        cache_key = make_cache_key(
+            model, temperature, "text", f"{instructions or ''}\n\n{prompt}"
+        )
+        cached = await asyncio.to_thread(get_cached_response, cache_key)
+        if cached is not None:
+            return cached
 
-def call_model_simple(model: str, prompt: str, temperature: float = 0.0) -> str:
-    """Call model (Gemini or OpenRouter) and return simple text response."""
     if is_openrouter_model(model):
-        return call_openrouter_model(model, [prompt], temperature)
+        content = await acall_openrouter_model(
+            model, build_messages(instructions, prompt), temperature
+        )
     else:
         # Use original Gemini approach
-        llm = ChatGoogleGenerativeAI(
-            model=model,
-            temperature=temperature,
-            max_retries=2,
-            api_key=os.getenv("GEMINI_API_KEY"),
-        )
-        result = llm.invoke(prompt)
-        return result.content
+        llm = get_gemini_llm(model, temperature)
+        result = await llm.ainvoke(build_messages(instructions, prompt))
+        content = result.content
+
+    # Don't cache empty responses, the caller treats those as a failed generation
+    if cache_key and content and content.strip():
+        await asyncio.to_thread(set_cached_response, cache_key, content)
+    return content
+
+
+# Cosine similarity above which two search queries are considered the same search
+QUERY_DEDUP_THRESHOLD = 0.95
+
+
+async def deduplicate_queries(queries: list[str]) -> list[tuple[str, Optional[list[float]]]]:
+    """Drop duplicate and near-duplicate search queries, keeping the first occurrence.
+
+    Returns each kept query with its embedding (None when it wasn't embedded), so
+    web_research can look it up in the semantic cache without embedding it again.
+    """
+    # Exact duplicates, ignoring case and surrounding whitespace
+    unique_queries = {}
+    for query in queries:
+        unique_queries.setdefault(query.strip().lower(), query)
+    queries = list(unique_queries.values())
+    if len(queries) < 2 or search_cache is None:
+        return [(query, None) for query in queries]
+
+    # Near duplicates, using the semantic cache's embedding model. This is only an
+    # optimization, so if the cache is disabled or the model is unavailable the exact
+    # deduplication is kept.
+    try:
+        embeddings = await asyncio.to_thread(search_cache.embed, queries)
+    except Exception:
+        logger.warning("Embedding search queries for deduplication failed", exc_info=True)
+        return [(query, None) for query in queries]
+    kept = []
+    for idx, embedding in enumerate(embeddings):
+        if all(float(embedding @ embeddings[k]) < QUERY_DEDUP_THRESHOLD for k in kept):
+            kept.append(idx)
+    return [(queries[idx], embeddings[idx].tolist()) for idx in kept]
 
 
 # Nodes
-def generate_query(state: OverallState, config: RunnableConfig) -> QueryGenerationState:
+async def generate_query(state: OverallState, config: RunnableConfig) -> QueryGenerationState:
     """LangGraph node that generates a search queries based on the User's question.
 
     Uses Gemini 2.0 Flash to create an optimized search query for web research based on
@@ -187,38 +493,40 @@ def generate_query(state: OverallState, config: RunnableConfig) -> QueryGenerati
         state["initial_search_query_count"] = configurable.number_of_initial_queries
 
     # init Gemini 2.0 Flash
-    llm = ChatGoogleGenerativeAI(
-        model=configurable.query_generator_model,
-        temperature=1.0,
-        max_retries=2,
-        api_key=os.getenv("GEMINI_API_KEY"),
+    structured_llm = get_structured_gemini_llm(
+        configurable.query_generator_model, 1.0, SearchQueryList
     )
-    structured_llm = llm.with_structured_output(SearchQueryList)
 
     # Format the prompt
     current_date = get_current_date()
-    formatted_prompt = query_writer_instructions.format(
+    formatted_prompt = query_writer_input.format(
         current_date=current_date,
         research_topic=get_research_topic(state["messages"]),
         number_queries=state["initial_search_query_count"],
     )
     # Generate the search queries
-    result = structured_llm.invoke(formatted_prompt)
+    result = await structured_llm.ainvoke(
+        build_messages(query_writer_instructions, formatted_prompt)
+    )
     return {"query_list": result.query}
 
 
-def continue_to_web_research(state: QueryGenerationState):
+async def continue_to_web_research(state: QueryGenerationState):
     """LangGraph node that sends the search queries to the web research node.
 
-    This is used to spawn n number of web research nodes, one for each search query.
+    This is used to spawn n number of web research nodes, one for each unique search query.
     """
+    query_list = await deduplicate_queries(state["query_list"])
     return [
-        Send("web_research", {"search_query": search_query, "id": int(idx)})
-        for idx, search_query in enumerate(state["query_list"])
+        Send(
+            "web_research",
+            {"search_query": search_query, "id": int(idx), "query_embedding": embedding},
+        )
+        for idx, (search_query, embedding) in enumerate(query_list)
     ]
 
 
-def web_research(state: WebSearchState, config: RunnableConfig) -> OverallState:
+async def web_research(state: WebSearchState, config: RunnableConfig) -> OverallState:
     """LangGraph node that performs web research using the native Google Search API tool.
 
     Executes a web search using the native Google Search API tool in combination with Gemini 2.0 Flash.
@@ -232,16 +540,45 @@ def web_research(state: WebSearchState, config: RunnableConfig) -> OverallState:
     """
     # Configure
     configurable = Configuration.from_runnable_config(config)
-    formatted_prompt = web_searcher_instructions.format(
+
+    # Reuse the result of a semantically equivalent query if we've already researched one.
+    # The cache is best-effort, any failure falls through to a live search.
+    query_embedding = None
+    cached = None
+    if search_cache is not None:
+        try:
+            if state.get("query_embedding") is not None:
+                query_embedding = np.asarray(state["query_embedding"], dtype="float32")
+            else:
+                query_embedding = (
+                    await asyncio.to_thread(search_cache.embed, [state["search_query"]])
+                )[0]
+            cached = await asyncio.to_thread(
+                search_cache.search, query_embedding, configurable.query_generator_model
+            )
+        except Exception:
+            logger.warning("Semantic search cache lookup failed", exc_info=True)
+    if cached is not None:
+        modified_text, sources_gathered = remap_short_urls(
+            cached["web_research_result"], cached["sources_gathered"], cached["id"], state["id"]
+        )
+        return {
+            "sources_gathered": sources_gathered,
+            "search_query": [state["search_query"]],
+            "web_research_result": [modified_text],
+        }
+
+    formatted_prompt = web_searcher_input.format(
         current_date=get_current_date(),
         research_topic=state["search_query"],
     )
 
     # Uses the google genai client as the langchain client doesn't return grounding metadata
-    response = genai_client.models.generate_content(
+    response = await get_genai_client().aio.models.generate_content(
         model=configurable.query_generator_model,
         contents=formatted_prompt,
         config={
+            "system_instruction": web_searcher_instructions,
             "tools": [{"google_search": {}}],
             "temperature": 0,
         },
@@ -253,7 +590,21 @@ def web_research(state: WebSearchState, config: RunnableConfig) -> OverallState:
     # Gets the citations and adds them to the generated text
     citations = get_citations(response, resolved_urls)
     modified_text = insert_citation_markers(response.text, citations)
-    sources_gathered = [item for citation in citations for item in citation["segments"]]
+    sources_gathered = list(chain.from_iterable(citation["segments"] for citation in citations))
+    if query_embedding is not None:
+        try:
+            await asyncio.to_thread(
+                search_cache.add,
+                query_embedding,
+                configurable.query_generator_model,
+                {
+                    "id": state["id"],
+                    "sources_gathered": sources_gathered,
+                    "web_research_result": modified_text,
+                },
+            )
+        except Exception:
+            logger.warning("Semantic search cache insert failed", exc_info=True)
 
     return {
         "sources_gathered": sources_gathered,
@@ -262,7 +613,7 @@ def web_research(state: WebSearchState, config: RunnableConfig) -> OverallState:
     }
 
 
-def reflection(state: OverallState, config: RunnableConfig) -> ReflectionState:
+async def reflection(state: OverallState, config: RunnableConfig) -> ReflectionState:
     """LangGraph node that identifies knowledge gaps and generates potential follow-up queries.
 
     Analyzes the current summary to identify areas for further research and generates
@@ -281,21 +632,42 @@ def reflection(state: OverallState, config: RunnableConfig) -> ReflectionState:
     state["research_loop_count"] = state.get("research_loop_count", 0) + 1
     reasoning_model = state.get("reasoning_model") or configurable.reasoning_model
 
-    # Format the prompt
-    current_date = get_current_date()
-    formatted_prompt = reflection_instructions.format(
-        current_date=current_date,
+    # Format the prompt, counting tokens off the event loop
+    summaries = await asyncio.to_thread(truncate_summaries, state["web_research_result"])
+    formatted_prompt = reflection_input.format(
         research_topic=get_research_topic(state["messages"]),
-        summaries="\n\n---\n\n".join(state["web_research_result"]),
+        summaries="\n\n---\n\n".join(summaries),
     )
     
     # Use the new unified model calling function
-    result = call_model_with_structured_output(
-        model=reasoning_model,
-        prompt=formatted_prompt,
-        schema_class=Reflection,
-        temperature=1.0
-    )
+    try:
+        result = await acall_model_with_structured_output(
+            model=reasoning_model,
+            prompt=formatted_prompt,
+            schema_class=Reflection,
+            temperature=1.0,
+            instructions=reflection_instructions,
+            speculative_model=(
+                configurable.query_generator_model if configurable.speculative else None
+            ),
+            use_fallback=False,
+        )
+    except Exception:
+        # Rather than searching for a placeholder query, answer with what was gathered so
+        # far; finalize_answer tells the user the research was cut short
+        logger.error(
+            "Reflection with %s failed, answering with the research so far",
+            reasoning_model,
+            exc_info=True,
+        )
+        return {
+            "is_sufficient": True,
+            "knowledge_gap": "",
+            "follow_up_queries": [],
+            "research_loop_count": state["research_loop_count"],
+            "number_of_ran_queries": len(state["search_query"]),
+            "reflection_failed": True,
+        }
 
     return {
         "is_sufficient": result.is_sufficient,
@@ -303,10 +675,11 @@ def reflection(state: OverallState, config: RunnableConfig) -> ReflectionState:
         "follow_up_queries": result.follow_up_queries,
         "research_loop_count": state["research_loop_count"],
         "number_of_ran_queries": len(state["search_query"]),
+        "reflection_failed": False,
     }
 
 
-def evaluate_research(
+async def evaluate_research(
     state: ReflectionState,
     config: RunnableConfig,
 ) -> OverallState:
@@ -331,19 +704,21 @@ def evaluate_research(
     if state["is_sufficient"] or state["research_loop_count"] >= max_research_loops:
         return "finalize_answer"
     else:
+        follow_up_queries = await deduplicate_queries(state["follow_up_queries"])
         return [
             Send(
                 "web_research",
                 {
                     "search_query": follow_up_query,
                     "id": state["number_of_ran_queries"] + int(idx),
+                    "query_embedding": embedding,
                 },
             )
-            for idx, follow_up_query in enumerate(state["follow_up_queries"])
+            for idx, (follow_up_query, embedding) in enumerate(follow_up_queries)
         ]
 
 
-def finalize_answer(state: OverallState, config: RunnableConfig):
+async def finalize_answer(state: OverallState, config: RunnableConfig):
     """LangGraph node that finalizes the research summary.
 
     Prepares the final output by deduplicating and formatting sources, then
@@ -365,47 +740,70 @@ def finalize_answer(state: OverallState, config: RunnableConfig):
     # Add source information to the prompt for better context
     sources_context = ""
     if state.get("sources_gathered"):
-        sources_context = "\n\nAvailable sources to reference:\n"
-        for i, source in enumerate(state["sources_gathered"][:10]):  # Limit to top 10 sources
-            sources_context += f"[{i+1}] {source.get('title', 'Source')} - {source.get('short_url', source.get('value', ''))}\n"
-        sources_context += "\nPlease reference these sources in your answer using the format [title](url) where appropriate.\n"
+        sources_context = (
+            "\n\nAvailable sources to reference:\n"
+            + "".join(
+                f"[{i+1}] {source.get('title', 'Source')} - {source.get('short_url', source.get('value', ''))}\n"
+                for i, source in enumerate(state["sources_gathered"][:10])  # Limit to top 10 sources
+            )
+            + "\nPlease reference these sources in your answer using the format [title](url) where appropriate.\n"
+        )
     
-    formatted_prompt = answer_instructions.format(
+    summaries = await asyncio.to_thread(truncate_summaries, state["web_research_result"])
+    formatted_prompt = answer_input.format(
         current_date=current_date,
         research_topic=get_research_topic(state["messages"]),
-        summaries="\n---\n\n".join(state["web_research_result"]) + sources_context,
+        summaries="\n---\n\n".join(summaries) + sources_context,
     )
 
     # Use the new unified model calling function
-    result_content = call_model_simple(
+    content = await acall_model_simple(
         model=reasoning_model,
         prompt=formatted_prompt,
-        temperature=0.0
+        temperature=0.0,
+        instructions=answer_instructions,
     )
     
     # Ensure we have valid content before proceeding
-    if not result_content or not result_content.strip():
-        result_content = "I apologize, but I encountered an issue generating the response. Please try again."
+    if not content or not content.strip():
+        content = "I apologize, but I encountered an issue generating the response. Please try again."
     
-    # Create an AIMessage with the result
-    result = AIMessage(content=result_content)
-
     # Replace the short urls with the original urls and add all used urls to the sources_gathered
     unique_sources = []
     if state.get("sources_gathered"):
-        for source in state["sources_gathered"]:
-            # Check if the source URL appears in the result (both short and original)
-            short_url = source.get("short_url", "")
-            original_url = source.get("value", "")
-            
-            if short_url and short_url in result.content:
-                result.content = result.content.replace(short_url, original_url)
-                unique_sources.append(source)
-            elif original_url and original_url in result.content:
-                unique_sources.append(source)
-            # Also check if source title/label is referenced
-            elif source.get("label") and f"[{source.get('label')}]" in result.content:
-                unique_sources.append(source)
+        sources = state["sources_gathered"]
+        short_url_map = {
+            source["short_url"]: source.get("value", "")
+            for source in sources
+            if source.get("short_url")
+        }
+        # Single pass over the content for all short urls, instead of one scan per source
+        used_short_urls = set()
+        short_url_pattern = compile_alternation(short_url_map)
+        if short_url_pattern:
+            def expand_short_url(match):
+                used_short_urls.add(match.group(0))
+                return short_url_map[match.group(0)]
+
+            content = short_url_pattern.sub(expand_short_url, content)
+
+        # Check which original urls and [label] references appear in the content
+        original_url_pattern = compile_alternation(source.get("value", "") for source in sources)
+        used_original_urls = (
+            set(original_url_pattern.findall(content)) if original_url_pattern else set()
+        )
+        label_pattern = compile_alternation(
+            f"[{source['label']}]" for source in sources if source.get("label")
+        )
+        used_labels = set(label_pattern.findall(content)) if label_pattern else set()
+
+        unique_sources = [
+            source
+            for source in sources
+            if source.get("short_url") in used_short_urls
+            or source.get("value") in used_original_urls
+            or (source.get("label") and f"[{source['label']}]" in used_labels)
+        ]
 
     # If no sources were found in the content but we have sources, append them at the end
     if not unique_sources and state.get("sources_gathered"):
@@ -413,17 +811,23 @@ def finalize_answer(state: OverallState, config: RunnableConfig):
         unique_sources = state["sources_gathered"][:5]
         
         # Add a sources section if the response doesn't already include sources
-        if not any(marker in result.content.lower() for marker in ["source", "reference", "[", "http"]):
-            sources_text = "\n\n**Sources:**\n"
-            for i, source in enumerate(unique_sources, 1):
-                title = source.get("label", source.get("title", f"Source {i}"))
-                url = source.get("value", source.get("short_url", ""))
-                if url:
-                    sources_text += f"{i}. [{title}]({url})\n"
-            result.content += sources_text
+        if not any(marker in content.lower() for marker in ["source", "reference", "[", "http"]):
+            sources_lines = (
+                (i, source.get("label", source.get("title", f"Source {i}")), source.get("value", source.get("short_url", "")))
+                for i, source in enumerate(unique_sources, 1)
+            )
+            content += "\n\n**Sources:**\n" + "".join(
+                f"{i}. [{title}]({url})\n" for i, title, url in sources_lines if url
+            )
+
+    if state.get("reflection_failed"):
+        content += (
+            "\n\n_Note: the research was stopped early because the gathered information "
+            "couldn't be evaluated for gaps, so this answer may be incomplete._"
+        )
 
     return {
-        "messages": [AIMessage(content=result.content)],
+        "messages": [AIMessage(content=content)],
         "sources_gathered": unique_sources,
     }
 
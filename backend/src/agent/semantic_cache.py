@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+import uuid
+from typing import Optional
+
+import faiss
+import numpy as np
+from diskcache import Cache
+from sentence_transformers import SentenceTransformer
+
+
+class SemanticSearchCache:
+    """
+    Cache of web research results keyed by the meaning of the search query.
+
+    Queries are embedded with a sentence-transformer and looked up in a FAISS inner-product
+    index over normalized vectors, so a lookup is a cosine-similarity search. Near-duplicate
+    queries (e.g. "Apple iPhone sales 2024" and "iPhone unit sales fiscal 2024") reuse the
+    result of the first one instead of paying for another Gemini + Google Search round trip.
+
+    Embeddings and payloads are kept in two diskcaches (each capped at `size_limit` bytes),
+    which write entries atomically, are safe to share between server workers and expire
+    entries after `ttl` seconds. The FAISS index mirrors the embeddings in memory and is
+    synced every `refresh_interval` seconds, only reading the embeddings it doesn't know
+    yet. Lookups and inserts do blocking I/O, so async callers should run them in a thread.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        model_name: str = "all-MiniLM-L6-v2",
+        similarity_threshold: float = 0.92,
+        ttl: int = 24 * 60 * 60,
+        size_limit: int = 256 * 1024 * 1024,
+        refresh_interval: float = 60,
+        candidates: int = 5,
+    ):
+        self.model_name = model_name
+        self.similarity_threshold = similarity_threshold
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        # Nearest cached queries considered on a lookup, so a close match researched with
+        # another model or already expired doesn't hide a usable one
+        self.candidates = candidates
+        self._embeddings = Cache(os.path.join(cache_dir, "embeddings"), size_limit=size_limit)
+        self._payloads = Cache(os.path.join(cache_dir, "payloads"), size_limit=size_limit)
+
+        self._model = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        # key -> (embedding, model) of every indexed entry, in index order
+        self._entries: dict[str, tuple[np.ndarray, str]] = {}
+        self._keys: list[str] = []
+        self._index = None
+        # Keys added while a refresh is running, so the refresh doesn't drop them
+        self._added_during_refresh: Optional[set[str]] = None
+        self._refreshed_at: Optional[float] = None
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """
+        Embed the texts into L2-normalized float32 vectors, one row per text.
+
+        The model is loaded on first use so importing the graph stays cheap.
+        """
+        if self._model is None:
+            self._model = SentenceTransformer(self.model_name)
+        embeddings = np.asarray(self._model.encode(texts), dtype="float32")
+        faiss.normalize_L2(embeddings)
+        return embeddings
+
+    def search(self, embedding: np.ndarray, model: str) -> Optional[dict]:
+        """
+        Return the payload of the most similar unexpired query researched with `model`, or
+        None if no such query is at least `similarity_threshold` similar to the embedding.
+        """
+        if self._refreshed_at is None or time.monotonic() - self._refreshed_at > self.refresh_interval:
+            self._refresh()
+
+        with self._lock:
+            if not self._keys:
+                return None
+            scores, ids = self._index.search(
+                embedding.reshape(1, -1), min(self.candidates, len(self._keys))
+            )
+            keys = [
+                self._keys[idx]
+                for score, idx in zip(scores[0], ids[0])
+                if idx >= 0
+                and score >= self.similarity_threshold
+                and self._entries[self._keys[idx]][1] == model
+            ]
+
+        for key in keys:
+            # Entries can expire or be evicted after they were indexed, those are misses
+            payload = self._payloads.get(key)
+            if payload is not None:
+                return payload
+        return None
+
+    def add(self, embedding: np.ndarray, model: str, payload: dict) -> None:
+        """
+        Store the payload of a query researched with `model` and add it to the index.
+        """
+        key = uuid.uuid4().hex
+        self._payloads.set(key, payload, expire=self.ttl)
+        self._embeddings.set(key, (embedding, model), expire=self.ttl)
+        with self._lock:
+            self._entries[key] = (embedding, model)
+            if self._added_during_refresh is not None:
+                self._added_during_refresh.add(key)
+            if self._index is None:
+                self._index = faiss.IndexFlatIP(embedding.shape[-1])
+            self._index.add(embedding.reshape(1, -1))
+            self._keys.append(key)
+
+    def _refresh(self) -> None:
+        """
+        Sync the index with the store: pick up entries added by other workers and drop the
+        expired or evicted ones. Only one refresh runs at a time, concurrent lookups keep
+        using the current index meanwhile.
+        """
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            with self._lock:
+                known = set(self._entries)
+                self._added_during_refresh = set()
+
+            self._embeddings.expire()
+            self._payloads.expire()
+            store_keys = set(self._embeddings.iterkeys())
+            new_entries = {}
+            for key in store_keys - known:
+                entry = self._embeddings.get(key)
+                if entry is not None:
+                    new_entries[key] = entry
+
+            with self._lock:
+                live_keys = store_keys | self._added_during_refresh
+                self._added_during_refresh = None
+                entries = {key: entry for key, entry in self._entries.items() if key in live_keys}
+                entries.update(new_entries)
+                if entries.keys() != self._entries.keys():
+                    self._entries = entries
+                    self._rebuild_index()
+                self._refreshed_at = time.monotonic()
+        finally:
+            self._refresh_lock.release()
+
+    def _rebuild_index(self) -> None:
+        """
+        Rebuild the FAISS index from the in-memory entries, the caller holds the lock.
+        """
+        self._keys = list(self._entries)
+        self._index = None
+        if self._keys:
+            embeddings = np.vstack([embedding for embedding, _ in self._entries.values()])
+            self._index = faiss.IndexFlatIP(embeddings.shape[-1])
+            self._index.add(embeddings)
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import TypedDict
+from typing import Optional, TypedDict
 
 from langgraph.graph import add_messages
 from typing_extensions import Annotated
@@ -21,6 +21,7 @@ class OverallState(TypedDict):
     max_research_loops: int
     research_loop_count: int
     reasoning_model: str
+    reflection_failed: bool
 
 
 class ReflectionState(TypedDict):
@@ -29,6 +30,7 @@ class ReflectionState(TypedDict):
     follow_up_queries: Annotated[list, operator.add]
     research_loop_count: int
     number_of_ran_queries: int
+    reflection_failed: bool
 
 
 class Query(TypedDict):
@@ -43,6 +45,7 @@ class QueryGenerationState(TypedDict):
 class WebSearchState(TypedDict):
     search_query: str
     id: str
+    query_embedding: Optional[list[float]]
 
 
 @dataclass(kw_only=True)
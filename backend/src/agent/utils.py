@@ -1,6 +1,13 @@
-from typing import Any, Dict, List
+import functools
+import logging
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+import tiktoken
 from langchain_core.messages import AnyMessage, AIMessage, HumanMessage
 
+logger = logging.getLogger(__name__)
+
 
 def get_research_topic(messages: List[AnyMessage]) -> str:
     """
@@ -19,6 +26,66 @@ def get_research_topic(messages: List[AnyMessage]) -> str:
     return research_topic
 
 
+# Rough characters per token, used when the tokenizer isn't available
+CHARS_PER_TOKEN = 4
+
+
+@functools.lru_cache(maxsize=1)
+def get_token_encoding() -> Optional[tiktoken.Encoding]:
+    """
+    Get the tokenizer used to estimate prompt sizes, loaded once.
+
+    tiktoken downloads the encoding on first use (into TIKTOKEN_CACHE_DIR when set, so it
+    can be pre-fetched for offline deployments), so this returns None (and callers fall
+    back to a character based estimate) when it can't be fetched, e.g. offline.
+    """
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        logger.warning("Could not load the cl100k_base encoding, estimating tokens from length", exc_info=True)
+        return None
+
+
+def truncate_summaries(results: List[str], max_tokens: int = 8000) -> List[str]:
+    """
+    Keep the most recent web research results that fit in a token budget.
+
+    Results are added newest first until the next one would exceed `max_tokens`. The
+    kept results are returned in their original order. The newest result is always kept,
+    cut down to the budget if it doesn't fit on its own. If anything was dropped or cut,
+    a marker is put in front of the results.
+
+    The encoding is loaded (and possibly downloaded) on the first call, so async callers
+    should run this in a thread.
+    """
+    encoding = get_token_encoding()
+    kept = []
+    used_tokens = 0
+    truncated = False
+    for result in reversed(results):
+        if encoding:
+            tokens = encoding.encode(result, disallowed_special=())
+            token_count = len(tokens)
+        else:
+            token_count = len(result) // CHARS_PER_TOKEN
+        if used_tokens + token_count > max_tokens:
+            truncated = True
+            if not kept:
+                kept.append(
+                    encoding.decode(tokens[:max_tokens])
+                    if encoding
+                    else result[: max_tokens * CHARS_PER_TOKEN]
+                )
+            break
+        kept.append(result)
+        used_tokens += token_count
+
+    kept.reverse()
+    if truncated:
+        kept.insert(0, "[…summaries truncated to fit the context…]")
+    return kept
+
+
 def resolve_urls(urls_to_resolve: List[Any], id: int) -> Dict[str, str]:
     """
     Create a map of the vertex ai search urls (very long) to a short url with a unique id for each url.
@@ -36,6 +103,37 @@ def resolve_urls(urls_to_resolve: List[Any], id: int) -> Dict[str, str]:
     return resolved_map
 
 
+def remap_short_urls(text: str, sources: List[Dict[str, Any]], old_id: int, new_id: int):
+    """
+    Rewrite the short urls created by `resolve_urls` for `old_id` to use `new_id`.
+    Used when reusing a cached research result for a different search query, so its
+    citations don't collide with the short urls of the other queries in the run.
+    """
+    if old_id == new_id:
+        return text, sources
+    old_prefix = f"https://vertexaisearch.cloud.google.com/id/{old_id}-"
+    new_prefix = f"https://vertexaisearch.cloud.google.com/id/{new_id}-"
+    remapped_sources = [
+        {**source, "short_url": source["short_url"].replace(old_prefix, new_prefix)}
+        if source.get("short_url")
+        else source
+        for source in sources
+    ]
+    return text.replace(old_prefix, new_prefix), remapped_sources
+
+
+def compile_alternation(literals: Iterable[str]) -> Optional[re.Pattern]:
+    """
+    Compile a regex matching any of the given literal strings, or None if there are none.
+    Longer literals are tried first so a string is never matched by one of its prefixes
+    (e.g. the short url ".../id/1-1" inside ".../id/1-10").
+    """
+    unique_literals = sorted({literal for literal in literals if literal}, key=len, reverse=True)
+    if not unique_literals:
+        return None
+    return re.compile("|".join(map(re.escape, unique_literals)))
+
+
 def insert_citation_markers(text, citations_list):
     """
     Inserts citation markers into a text string based on start and end indices.